@@ -4,16 +4,28 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi import BackgroundTasks
 
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, ForeignKey, Float
+from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, ForeignKey, Float, Index
+from sqlalchemy import select, update, func, case, cast, and_, event, bindparam, literal
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.orm import sessionmaker, declarative_base, Session, relationship
 
 from starlette.middleware.sessions import SessionMiddleware
 
+from cachetools import TTLCache
+from argon2 import PasswordHasher
+from argon2.exceptions import VerificationError, InvalidHashError
+
+from collections import defaultdict
 from datetime import datetime, timedelta
 import os
+import threading
+import re
 import hashlib
+import hmac
 import base64
-import shutil
+import uuid
+import aiofiles
 
 # ----------------- APP SETUP -----------------
 
@@ -24,17 +36,64 @@ app.add_middleware(SessionMiddleware, secret_key="your-secret-key-change-this-in
 os.makedirs("uploads", exist_ok=True)
 os.makedirs("static", exist_ok=True)
 
+class UploadFiles(StaticFiles):
+    """Serves uploads; content-hashed names never change, so browsers may cache them forever"""
+    HASHED_NAME = re.compile(r"^[0-9a-f]{32}(\.[A-Za-z0-9]+)?$")
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        if self.HASHED_NAME.match(os.path.basename(full_path)):
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+app.mount("/uploads", UploadFiles(directory="uploads"), name="uploads")
 
 templates = Jinja2Templates(directory="templates")
 
+# TTLCache is not thread-safe; sync routes, add_item and background tasks all
+# touch these caches, so each one is only used under its lock
+
+# Per-user dashboard stats, invalidated whenever a user's items change.
+# The version bumps on every invalidation so a slow reader can't cache stale stats.
+_stats_cache = TTLCache(maxsize=10_000, ttl=60)
+_stats_versions = {}
+_stats_lock = threading.Lock()
+
+# Set while a dashboard-triggered notification sweep ran in the last minute
+_recent_sweep = TTLCache(maxsize=1, ttl=60)
+_sweep_lock = threading.Lock()
+
+# Login attempts per (client ip, username) in the last minute
+_login_attempts = TTLCache(maxsize=10_000, ttl=60)
+_login_lock = threading.Lock()
+MAX_LOGIN_ATTEMPTS = 5
+
 # ----------------- DATABASE -----------------
 
 DATABASE_URL = "sqlite:///./food_tracker.db"
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+# Keep a pool of open connections so requests reuse them instead of reconnecting
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=QueuePool,
+    pool_size=5,
+    max_overflow=10
+)
+
+@event.listens_for(engine, "connect")
+def _sqlite_pragmas(dbapi_conn, _):
+    # WAL lets dashboard reads run alongside notification writes
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.execute("PRAGMA temp_store=MEMORY")
+    cur.execute("PRAGMA cache_size=-20000")
+    cur.execute("PRAGMA mmap_size=268435456")
+    cur.close()
+
 SessionLocal = sessionmaker(bind=engine)
 Base = declarative_base()
 
@@ -56,6 +115,11 @@ class User(Base):
 
 class FoodItem(Base):
     __tablename__ = "food_items"
+    __table_args__ = (
+        Index("ix_food_user_exp", "user_id", "expiry_date"),
+        Index("ix_food_user_flags", "user_id", "is_used", "is_expired"),
+        Index("ix_food_active_exp", "is_expired", "expiry_date"),
+    )
 
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -72,8 +136,24 @@ class FoodItem(Base):
     
     user = relationship("User", back_populates="food_items")
 
+class UserStats(Base):
+    """Running dashboard totals, kept in step with every item change"""
+    __tablename__ = "user_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    total_items = Column(Integer, default=0, nullable=False)
+    active_items = Column(Integer, default=0, nullable=False)
+    used_items = Column(Integer, default=0, nullable=False)
+    expired_items = Column(Integer, default=0, nullable=False)
+    # Whole cents, so repeated +/- deltas can't drift the way float sums do
+    money_saved_cents = Column(Integer, default=0, nullable=False)
+    money_wasted_cents = Column(Integer, default=0, nullable=False)
+
 class Notification(Base):
     __tablename__ = "notifications"
+    __table_args__ = (
+        Index("ix_notif_item", "food_item_id"),
+    )
 
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -84,6 +164,35 @@ class Notification(Base):
 
 Base.metadata.create_all(bind=engine)
 
+# create_all skips indexes on tables that already exist
+for table in Base.metadata.sorted_tables:
+    for index in table.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+# ----------------- HOT QUERIES -----------------
+# Built once so each request skips statement construction and cache-key generation
+
+# Whole days until expiry, computed by SQLite (same as calculate_days_until_expiry)
+_days_until_expiry = cast(
+    func.julianday(func.date(FoodItem.expiry_date))
+    - func.julianday(func.date("now", "localtime")),
+    Integer
+).label("days")
+
+# Stream rows in batches straight into the buckets rather than building a full result list
+_Q_DASHBOARD_ITEMS = select(FoodItem, _days_until_expiry).where(
+    FoodItem.user_id == bindparam("uid"),
+    FoodItem.is_used == False  # Don't show used items
+).order_by(FoodItem.expiry_date).execution_options(yield_per=1000)
+
+_Q_RECIPE_INGREDIENTS = select(FoodItem.name).where(
+    FoodItem.user_id == bindparam("uid"),
+    FoodItem.expiry_date <= bindparam("cutoff"),
+    FoodItem.is_expired == False
+).limit(3)
+
+_Q_USER_BY_USERNAME = select(User).where(User.username == bindparam("username"))
+
 # ----------------- SECURITY UTILS -----------------
 
 def get_db():
@@ -93,11 +202,28 @@ def get_db():
     finally:
         db.close()
 
+_password_hasher = PasswordHasher(time_cost=2, memory_cost=19456, parallelism=1)
+
+# Verified against when the username is unknown, so both paths pay the KDF cost
+_DUMMY_PASSWORD_HASH = _password_hasher.hash("not-a-real-password")
+
+def _is_legacy_hash(hashed: str) -> bool:
+    # Accounts created before argon2 store an unsalted SHA-256 hex digest
+    return len(hashed) == 64 and all(c in "0123456789abcdef" for c in hashed)
+
 def hash_password(password: str):
-    return hashlib.sha256(password.encode()).hexdigest()
+    return _password_hasher.hash(password)
 
 def verify_password(password: str, hashed: str):
-    return hashlib.sha256(password.encode()).hexdigest() == hashed
+    if _is_legacy_hash(hashed):
+        return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), hashed)
+    try:
+        return _password_hasher.verify(hashed, password)
+    except (VerificationError, InvalidHashError):
+        return False
+
+def password_needs_rehash(hashed: str) -> bool:
+    return _is_legacy_hash(hashed) or _password_hasher.check_needs_rehash(hashed)
 
 def require_login(request: Request):
     user_id = request.session.get("user_id")
@@ -126,38 +252,91 @@ def calculate_days_until_expiry(expiry_date: datetime) -> int:
     expiry = expiry_date.replace(hour=0, minute=0, second=0, microsecond=0)
     return (expiry - today).days
 
-def check_and_send_notifications(db: Session):
-    items = db.query(FoodItem).filter(FoodItem.is_expired == False).all()
+def check_and_send_notifications(db: Session, background_tasks: BackgroundTasks = None):
+    # Flag everything past its expiry date with one UPDATE instead of per-item writes
+    expire_stmt = update(FoodItem).where(
+        FoodItem.is_expired == False,
+        func.date(FoodItem.expiry_date) < func.date("now", "localtime")
+    )
+    # Nothing further out than the month notice can be due yet
+    cutoff = datetime.now() + timedelta(days=31)
+    query = db.query(FoodItem).filter(
+        FoodItem.is_expired == False,
+        FoodItem.expiry_date <= cutoff
+    )
+    
+    expired_items = db.execute(
+        expire_stmt.values(is_expired=True).returning(
+            FoodItem.id, FoodItem.user_id, FoodItem.name, FoodItem.price, FoodItem.is_used
+        ),
+        execution_options={"synchronize_session": False}
+    ).all()
+    items = query.all()
+    if not items and not expired_items:
+        return
+    
+    # Load already-sent notification types and owners up front instead of per item
+    item_ids = [item.id for item in items]
+    sent = defaultdict(set)
+    for food_item_id, notif_type in db.query(
+        Notification.food_item_id, Notification.notification_type
+    ).filter(Notification.food_item_id.in_(item_ids)).all():
+        sent[food_item_id].add(notif_type)
+    
+    owner_ids = {item.user_id for item in items} | {item.user_id for item in expired_items}
+    users = {u.id: u for u in db.query(User).filter(User.id.in_(owner_ids)).all()}
+    recipes_by_user = {}
+    sms_queue = []
+    
+    for item in expired_items:
+        send_notification(db, item, "expired", f"{item.name} has expired!",
+            users.get(item.user_id), sms_queue)
+        _adjust_user_stats(db, item.user_id,
+            expired_items=1,
+            active_items=0 if item.is_used else -1,
+            money_wasted_cents=item_value_cents(item))
     
     for item in items:
         days_left = calculate_days_until_expiry(item.expiry_date)
-        
-        if days_left < 0:
-            item.is_expired = True
-            send_notification(db, item, "expired", f"{item.name} has expired!")
-            db.commit()
-            continue
-        
-        existing_notifications = db.query(Notification).filter(
-            Notification.food_item_id == item.id
-        ).all()
-        
-        notification_types_sent = [n.notification_type for n in existing_notifications]
+        user = users.get(item.user_id)
+        notification_types_sent = sent[item.id]
         
         if days_left <= 30 and "month" not in notification_types_sent:
-            recipes = get_recipe_suggestions(db, item.user_id)
+            if item.user_id not in recipes_by_user:
+                recipes_by_user[item.user_id] = get_recipe_suggestions(db, item.user_id)
+            recipes = recipes_by_user[item.user_id]
             send_notification(db, item, "month", 
-                f"{item.name} expires in a month! Recipe ideas: {recipes}")
+                f"{item.name} expires in a month! Recipe ideas: {recipes}", user, sms_queue)
         
         if days_left <= 7 and "week" not in notification_types_sent:
             send_notification(db, item, "week", 
-                f"{item.name} expires in a week! Use it soon.")
+                f"{item.name} expires in a week! Use it soon.", user, sms_queue)
         
         if days_left <= 1 and "day" not in notification_types_sent:
             send_notification(db, item, "day", 
-                f"{item.name} expires tomorrow! Use it today.")
+                f"{item.name} expires tomorrow! Use it today.", user, sms_queue)
+    
+    # One transaction for the whole sweep
+    db.commit()
+    for owner_id in {item.user_id for item in expired_items}:
+        invalidate_user_stats(owner_id)
+    
+    # SMS only goes out once the notifications are persisted
+    for phone, message in sms_queue:
+        if background_tasks is not None:
+            background_tasks.add_task(send_sms_notification, phone, message)
+        else:
+            send_sms_notification(phone, message)
+
+def check_and_send_notifications_with_own_session():
+    """Run the sweep as a background task; the request's session is closed by then"""
+    db = SessionLocal()
+    try:
+        check_and_send_notifications(db)
+    finally:
+        db.close()
 
-def send_notification(db: Session, item: FoodItem, notif_type: str, message: str):
+def send_notification(db: Session, item: FoodItem, notif_type: str, message: str, user: User, sms_queue: list):
     notification = Notification(
         user_id=item.user_id,
         food_item_id=item.id,
@@ -165,14 +344,14 @@ def send_notification(db: Session, item: FoodItem, notif_type: str, message: str
         message=message
     )
     db.add(notification)
-    db.commit()
     
     print(f"NOTIFICATION [{notif_type}]: {message}")
     
-    # NEW: Send SMS if phone number exists
-    user = db.get(User, item.user_id)
+    # NEW: Queue SMS if phone number exists; the caller sends after commit
     if user and user.phone:
-        send_sms_notification(user.phone, message)
+        sms_queue.append((user.phone, message))
+    
+    return notification
 
 def send_sms_notification(phone: str, message: str):
     """
@@ -188,47 +367,130 @@ def send_sms_notification(phone: str, message: str):
 
 def get_recipe_suggestions(db: Session, user_id: int) -> str:
     thirty_days = datetime.now() + timedelta(days=30)
-    expiring_items = db.query(FoodItem).filter(
-        FoodItem.user_id == user_id,
-        FoodItem.expiry_date <= thirty_days,
-        FoodItem.is_expired == False
-    ).all()
-    
-    ingredients = [item.name for item in expiring_items]
+    ingredients = db.scalars(_Q_RECIPE_INGREDIENTS, {"uid": user_id, "cutoff": thirty_days}).all()
     
     if not ingredients:
         return "No recipes available"
     
-    return f"You have: {', '.join(ingredients[:3])}. Try making a stir-fry, soup, or salad!"
+    return f"You have: {', '.join(ingredients)}. Try making a stir-fry, soup, or salad!"
 
-def calculate_user_stats(db: Session, user_id: int):
-    """Calculate statistics for user dashboard"""
-    all_items = db.query(FoodItem).filter(FoodItem.user_id == user_id).all()
-    
-    total_items = len(all_items)
-    expired_items = len([i for i in all_items if i.is_expired])
-    used_items = len([i for i in all_items if i.is_used])
-    active_items = len([i for i in all_items if not i.is_expired and not i.is_used])
-    
-    # Calculate money saved (items used before expiry)
-    money_saved = sum([i.price or 5.0 for i in all_items if i.is_used])
+def item_value_cents(item) -> int:
+    # Items without a price count as $5.00
+    return round((item.price or 5.0) * 100)
+
+def _adjust_user_stats(db: Session, user_id: int, **deltas):
+    """Apply deltas to a user's stats row in the caller's transaction.
     
-    # Calculate money wasted (expired items)
-    money_wasted = sum([i.price or 5.0 for i in all_items if i.is_expired])
+    A missing row is left alone; it is rebuilt from food_items on next read.
+    """
+    db.execute(
+        update(UserStats).where(UserStats.user_id == user_id).values(
+            **{col: getattr(UserStats, col) + delta for col, delta in deltas.items()}
+        ),
+        execution_options={"synchronize_session": False}
+    )
+
+def calculate_user_stats(db: Session, user_id: int):
+    """Calculate statistics for user dashboard (cached per user)"""
+    with _stats_lock:
+        stats = _stats_cache.get(user_id)
+        version = _stats_versions.get(user_id, 0)
+    if stats is None:
+        stats = _load_user_stats(db, user_id)
+        with _stats_lock:
+            # Skip caching if the user's items changed while we were loading
+            if _stats_versions.get(user_id, 0) == version:
+                _stats_cache[user_id] = stats
+    return stats
+
+def invalidate_user_stats(user_id: int):
+    with _stats_lock:
+        _stats_cache.pop(user_id, None)
+        _stats_versions[user_id] = _stats_versions.get(user_id, 0) + 1
+
+def _load_user_stats(db: Session, user_id: int):
+    row = db.get(UserStats, user_id)
+    if row is None:
+        _seed_user_stats(user_id)
+        row = db.get(UserStats, user_id)
     
     # Calculate waste percentage
-    waste_percentage = (expired_items / total_items * 100) if total_items > 0 else 0
+    waste_percentage = (row.expired_items / row.total_items * 100) if row.total_items > 0 else 0
     
     return {
-        "total_items": total_items,
-        "expired_items": expired_items,
-        "used_items": used_items,
-        "active_items": active_items,
-        "money_saved": round(money_saved, 2),
-        "money_wasted": round(money_wasted, 2),
+        "total_items": row.total_items,
+        "expired_items": row.expired_items,
+        "used_items": row.used_items,
+        "active_items": row.active_items,
+        "money_saved": row.money_saved_cents / 100,
+        "money_wasted": row.money_wasted_cents / 100,
         "waste_percentage": round(waste_percentage, 1)
     }
 
+def _seed_user_stats(user_id: int):
+    """Create a user's stats row from food_items on first read.
+    
+    Runs as a single INSERT ... SELECT so no item write can slip between the
+    aggregate and the insert, and in its own session so the caller's loaded
+    objects are not expired by the commit.
+    """
+    with SessionLocal() as seed_db:
+        seed_db.execute(
+            sqlite_insert(UserStats)
+            .from_select(
+                ["user_id", "total_items", "expired_items", "used_items",
+                 "active_items", "money_saved_cents", "money_wasted_cents"],
+                _user_stats_aggregate(user_id)
+            )
+            .on_conflict_do_nothing(index_elements=["user_id"])
+        )
+        seed_db.commit()
+
+def _user_stats_aggregate(user_id: int):
+    # Items without a price count as $5.00; rounded per item like item_value_cents
+    cents = cast(func.round(func.coalesce(func.nullif(FoodItem.price, 0), 5.0) * 100), Integer)
+    
+    return select(
+        literal(user_id, Integer),
+        func.count(FoodItem.id),
+        func.coalesce(func.sum(case((FoodItem.is_expired == True, 1), else_=0)), 0),
+        func.coalesce(func.sum(case((FoodItem.is_used == True, 1), else_=0)), 0),
+        func.coalesce(func.sum(case(
+            (and_(FoodItem.is_expired == False, FoodItem.is_used == False), 1), else_=0
+        )), 0),
+        # Money saved (items used before expiry)
+        func.coalesce(func.sum(case((FoodItem.is_used == True, cents), else_=0)), 0),
+        # Money wasted (expired items)
+        func.coalesce(func.sum(case((FoodItem.is_expired == True, cents), else_=0)), 0),
+    ).where(FoodItem.user_id == user_id)
+
+def remove_upload_if_unreferenced(image_path: str):
+    """Delete an uploaded image file if no food item points at it any more.
+    
+    An add_item for the same content may be in flight, so the file is moved aside
+    before the final reference check, and add_item restores it after committing
+    if it finds the file missing.
+    """
+    filepath = image_path.replace("/uploads/", "uploads/")
+    trash_path = os.path.join("uploads", f".{uuid.uuid4().hex}.trash")
+    
+    with SessionLocal() as db:
+        def referenced():
+            return db.query(db.query(FoodItem).filter(
+                FoodItem.image_path == image_path
+            ).exists()).scalar()
+        
+        if referenced():
+            return
+        try:
+            os.replace(filepath, trash_path)
+        except FileNotFoundError:
+            return
+        if referenced():
+            os.replace(trash_path, filepath)
+        else:
+            os.remove(trash_path)
+
 # ----------------- AUTH ROUTES -----------------
 
 @app.get("/", response_class=HTMLResponse)
@@ -246,7 +508,22 @@ def login(
     password: str = Form(...),
     db: Session = Depends(get_db)
 ):
-    user = db.query(User).filter(User.username == username).first()
+    # Bound how often the password KDF can be driven for one account
+    attempt_key = (request.client.host if request.client else "", username)
+    with _login_lock:
+        attempts = _login_attempts.get(attempt_key, 0) + 1
+        _login_attempts[attempt_key] = attempts
+    if attempts > MAX_LOGIN_ATTEMPTS:
+        return templates.TemplateResponse("login.html", {
+            "request": request,
+            "error": "Too many login attempts. Please wait a minute and try again."
+        }, status_code=429)
+    
+    user = db.scalars(_Q_USER_BY_USERNAME, {"username": username}).first()
+
+    if not user:
+        # Same work as a real check so timing doesn't reveal which accounts exist
+        verify_password(password, _DUMMY_PASSWORD_HASH)
 
     if not user or not verify_password(password, user.password):
         return templates.TemplateResponse("login.html", {
@@ -254,12 +531,19 @@ def login(
             "error": "Invalid username or password"
         })
 
+    # Upgrade legacy SHA-256 hashes now that we have the plaintext
+    if password_needs_rehash(user.password):
+        user.password = hash_password(password)
+        db.commit()
+
     if not user.is_approved:
         return templates.TemplateResponse("login.html", {
             "request": request,
             "error": "Your account is pending admin approval"
         })
 
+    with _login_lock:
+        _login_attempts.pop(attempt_key, None)
     request.session["user_id"] = user.id
 
     if user.is_admin:
@@ -280,9 +564,11 @@ def signup(
     phone: str = Form(""),
     db: Session = Depends(get_db)
 ):
-    existing_user = db.query(User).filter(
-        (User.username == username) | (User.email == email)
-    ).first()
+    # Two EXISTS probes, each served by its own UNIQUE index, rather than an OR
+    existing_user = (
+        db.query(db.query(User).filter(User.username == username).exists()).scalar()
+        or db.query(db.query(User).filter(User.email == email).exists()).scalar()
+    )
     
     if existing_user:
         return templates.TemplateResponse("signup.html", {
@@ -290,7 +576,7 @@ def signup(
             "error": "Username or email already exists"
         })
 
-    is_first_user = db.query(User).count() == 0
+    is_first_user = not db.query(db.query(User).exists()).scalar()
 
     user = User(
         username=username,
@@ -314,30 +600,27 @@ def logout(request: Request):
 # ----------------- USER DASHBOARD -----------------
 
 @app.get("/dashboard", response_class=HTMLResponse)
-def dashboard(request: Request, db: Session = Depends(get_db)):
+def dashboard(request: Request, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     user = get_current_user(request, db)
     
-    # Auto-check notifications when viewing dashboard
-    check_and_send_notifications(db)
+    # Auto-check notifications for all users after the response is sent, at most once a minute
+    with _sweep_lock:
+        run_sweep = "sweep" not in _recent_sweep
+        if run_sweep:
+            _recent_sweep["sweep"] = True
+    if run_sweep:
+        background_tasks.add_task(check_and_send_notifications_with_own_session)
     
-    items = db.query(FoodItem).filter(
-        FoodItem.user_id == user.id,
-        FoodItem.is_used == False  # Don't show used items
-    ).order_by(FoodItem.expiry_date).all()
+    rows = db.execute(_Q_DASHBOARD_ITEMS, {"uid": user.id})
     
     expired = []
     expiring_soon = []
     fresh = []
     
-    for item in items:
-        days = calculate_days_until_expiry(item.expiry_date)
+    for item, days in rows:
         item.days_remaining = max(0, days)
         
-        # Auto-mark items as expired if past expiry date
-        if days < 0 and not item.is_expired:
-            item.is_expired = True
-            db.commit()
-        
+        # Past-due items are flagged (and notified) by the background sweep
         if item.is_expired or days < 0:
             expired.append(item)
         elif days <= 7:
@@ -382,31 +665,54 @@ async def add_item(
     
     # Handle image upload
     image_path = None
-    if image and image.filename:
-        # Create unique filename
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{user.id}_{timestamp}_{image.filename}"
-        filepath = os.path.join("uploads", filename)
+    tmp_path = None
+    try:
+        if image and image.filename:
+            # Reject non-images before writing anything to disk
+            if not (image.content_type or "").startswith("image/"):
+                raise HTTPException(status_code=400, detail="Uploaded file must be an image")
+            
+            # Save image in 1MB chunks without blocking the event loop, hashing as we go
+            tmp_path = os.path.join("uploads", f".{uuid.uuid4().hex}.tmp")
+            digest = hashlib.blake2b(digest_size=16)
+            async with aiofiles.open(tmp_path, "wb") as buffer:
+                while chunk := await image.read(1 << 20):
+                    digest.update(chunk)
+                    await buffer.write(chunk)
+            
+            # Name by content so repeat uploads of the same photo share one file
+            ext = os.path.splitext(image.filename)[1].lower()
+            filename = f"{digest.hexdigest()}{ext}"
+            filepath = os.path.join("uploads", filename)
+            if not os.path.exists(filepath):
+                os.replace(tmp_path, filepath)
+            
+            image_path = f"/uploads/{filename}"
         
-        # Save image
-        with open(filepath, "wb") as buffer:
-            shutil.copyfileobj(image.file, buffer)
+        item = FoodItem(
+            user_id=user.id,
+            name=name,
+            barcode=barcode if barcode else None,
+            category=category if category else None,
+            expiry_date=expiry,
+            quantity=quantity,
+            price=price,
+            image_path=image_path
+        )
         
-        image_path = f"/uploads/{filename}"
-    
-    item = FoodItem(
-        user_id=user.id,
-        name=name,
-        barcode=barcode if barcode else None,
-        category=category if category else None,
-        expiry_date=expiry,
-        quantity=quantity,
-        price=price,
-        image_path=image_path
-    )
-    
-    db.add(item)
-    db.commit()
+        db.add(item)
+        _adjust_user_stats(db, user.id, total_items=1, active_items=1)
+        db.commit()
+        invalidate_user_stats(user.id)
+        
+        # A concurrent delete may have removed the shared file before our row
+        # committed (see remove_upload_if_unreferenced); put it back from our copy
+        if image_path and not os.path.exists(filepath) and os.path.exists(tmp_path):
+            os.replace(tmp_path, filepath)
+    finally:
+        # Never leave a partial or duplicate upload in the served directory
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
     
     return RedirectResponse("/dashboard", status_code=302)
 
@@ -414,6 +720,7 @@ async def add_item(
 def delete_item(
     item_id: int,
     request: Request,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     user = get_current_user(request, db)
@@ -423,15 +730,21 @@ def delete_item(
     ).first()
     
     if item:
-        # Delete image if exists
-        if item.image_path:
-            try:
-                os.remove(item.image_path.replace("/uploads/", "uploads/"))
-            except:
-                pass
-        
+        image_path = item.image_path
         db.delete(item)
+        _adjust_user_stats(db, user.id,
+            total_items=-1,
+            active_items=0 if item.is_used or item.is_expired else -1,
+            used_items=-1 if item.is_used else 0,
+            expired_items=-1 if item.is_expired else 0,
+            money_saved_cents=-item_value_cents(item) if item.is_used else 0,
+            money_wasted_cents=-item_value_cents(item) if item.is_expired else 0)
         db.commit()
+        invalidate_user_stats(user.id)
+        
+        # Delete image once no other item shares it (uploads are deduped)
+        if image_path:
+            background_tasks.add_task(remove_upload_if_unreferenced, image_path)
     
     return RedirectResponse("/dashboard", status_code=302)
 
@@ -447,9 +760,14 @@ def mark_item_used(
         FoodItem.user_id == user.id
     ).first()
     
-    if item:
+    if item and not item.is_used:
         item.is_used = True
+        _adjust_user_stats(db, user.id,
+            used_items=1,
+            active_items=0 if item.is_expired else -1,
+            money_saved_cents=item_value_cents(item))
         db.commit()
+        invalidate_user_stats(user.id)
     
     return RedirectResponse("/dashboard", status_code=302)
 
@@ -458,14 +776,10 @@ def statistics_page(request: Request, db: Session = Depends(get_db)):
     user = get_current_user(request, db)
     stats = calculate_user_stats(db, user.id)
     
-    # Get monthly data for charts
-    all_items = db.query(FoodItem).filter(FoodItem.user_id == user.id).all()
-    
     return templates.TemplateResponse("statistics.html", {
         "request": request,
         "user": user,
-        "stats": stats,
-        "all_items": all_items
+        "stats": stats
     })
 
 @app.get("/notifications", response_class=HTMLResponse)
@@ -487,7 +801,8 @@ def recipes_page(request: Request, db: Session = Depends(get_db)):
     user = get_current_user(request, db)
     
     thirty_days = datetime.now() + timedelta(days=30)
-    expiring_items = db.query(FoodItem).filter(
+    # Template only renders name and expiry date
+    expiring_items = db.query(FoodItem.name, FoodItem.expiry_date).filter(
         FoodItem.user_id == user.id,
         FoodItem.expiry_date <= thirty_days,
         FoodItem.is_expired == False,
@@ -514,11 +829,16 @@ def scanner_page(request: Request, db: Session = Depends(get_db)):
 def admin_dashboard(request: Request, db: Session = Depends(get_db)):
     admin = require_admin(request, db)
     
-    pending_users = db.query(User).filter(User.is_approved == False).all()
+    # One users query; the template never touches user.food_items, so nothing to eager-load
     all_users = db.query(User).all()
+    pending_users = [u for u in all_users if not u.is_approved]
     
-    total_items = db.query(FoodItem).count()
-    expired_items = db.query(FoodItem).filter(FoodItem.is_expired == True).count()
+    total_items, expired_items = db.execute(
+        select(
+            func.count(FoodItem.id),
+            func.coalesce(func.sum(case((FoodItem.is_expired == True, 1), else_=0)), 0)
+        )
+    ).one()
     
     return templates.TemplateResponse("admin_dashboard.html", {
         "request": request,
@@ -557,8 +877,10 @@ def delete_user(
     
     user = db.get(User, user_id)
     if user:
+        db.query(UserStats).filter(UserStats.user_id == user_id).delete()
         db.delete(user)
         db.commit()
+        invalidate_user_stats(user_id)
     
     return RedirectResponse("/admin/dashboard", status_code=302)
 
@@ -567,5 +889,5 @@ def check_notifications_endpoint(
     background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
-    check_and_send_notifications(db)
+    check_and_send_notifications(db, background_tasks)
     return {"status": "Notifications checked"}
\ No newline at end of file